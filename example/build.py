@@ -1,8 +1,11 @@
 """Example build system for a django application."""
 
+import concurrent.futures
 import logging
 import os
 import pathlib
+import types
+import typing as t
 
 from jinja2 import Environment, FileSystemLoader
 
@@ -14,8 +17,12 @@ from bou.contrib import (
     django_collectstatic,
     django_migrate,
     download_tailwindcss_standalone,
+    get_files_digest,
+    get_user_cache_path,
     git_checkout_ref_sha,
+    hardlink_or_copy,
     pip_install_with_uv,
+    remove_expired_files,
     remove_stale_builds,
     render_template_and_save,
     tailwindcss_build_and_minify,
@@ -28,6 +35,63 @@ logger = logging.getLogger("bou")
 
 uv_path = which_or_raise("uv")
 
+# Checksums of the tailwindcss standalone binaries keyed on (version, platform),
+# copy them from the sha256sums.txt published with each release. Builds using a
+# version or platform without a pinned checksum download it unverified.
+TAILWINDCSS_SHA256: dict[tuple[str, str], str] = {}
+
+# Files tailwind scans for class candidates, relative to the build path. Django
+# loads templates from the templates directory of each installed app, the same
+# globs are declared with @source in the input stylesheet.
+TAILWINDCSS_SOURCE_GLOBS = ("example/**/templates/**/*.html",)
+
+# Compiled stylesheets which have not been used for 30 days are pruned
+TAILWINDCSS_OUTPUTS_MAX_AGE = 30 * 24 * 60 * 60
+
+# Snapshot of the process environment shared by every build step, helpers which
+# need extra variables derive their own copy
+ENVIRON = types.MappingProxyType({**os.environ})
+
+
+def wait_for_results(futures: list[concurrent.futures.Future]) -> None:
+    """Wait for all futures to complete, raising the first error encountered."""
+
+    for future in concurrent.futures.as_completed(futures):
+        future.result()
+
+
+def create_venv_and_install_dependencies(
+    build_path: pathlib.Path,
+    venv_path: pathlib.Path,
+    venv_prompt: str,
+    requirements_path: pathlib.Path,
+    environ: t.Mapping[str, str],
+) -> None:
+    """Create the virtual env and install the application dependencies."""
+
+    # Compile bytecode at install time and hardlink packages out of the uv cache
+    environ = {
+        **environ,
+        "UV_CONCURRENT_DOWNLOADS": "16",
+        "UV_COMPILE_BYTECODE": "1",
+        "UV_LINK_MODE": "hardlink",
+    }
+
+    create_venv_with_uv(
+        build_path=build_path,
+        venv_path=venv_path,
+        venv_prompt=venv_prompt,
+        uv_path=uv_path,
+        environ=environ,
+    )
+    pip_install_with_uv(
+        build_path=build_path,
+        venv_path=venv_path,
+        requirements_list=[f"-r {requirements_path}"],
+        uv_path=uv_path,
+        environ=environ,
+    )
+
 
 @hookimpl_v1
 def configure(
@@ -45,11 +109,19 @@ def configure(
     manage_path = build_path / "example/manage.py"
     venv_path = build_path / ".venv"
 
-    root_path = pathlib.Path(__file__).parent
-    tailwindcss_binaries_path = root_path / "tailwindcss"
-    tailwindcss_binaries_path.mkdir(exist_ok=True)
+    # Share tailwindcss binaries between all projects on the host
+    tailwindcss_binaries_path = get_user_cache_path() / "tailwindcss"
+    tailwindcss_binaries_path.mkdir(parents=True, exist_ok=True)
     tailwindcss_version = "v4.1.13"
-    tailwindcss_path = tailwindcss_binaries_path / tailwindcss_version
+    tailwindcss_platform = "linux-x64"
+    tailwindcss_path = (
+        tailwindcss_binaries_path / f"{tailwindcss_version}-{tailwindcss_platform}"
+    )
+    tailwindcss_outputs_path = tailwindcss_binaries_path / "outputs"
+    tailwindcss_outputs_path.mkdir(exist_ok=True)
+    remove_expired_files(
+        path=tailwindcss_outputs_path, max_age=TAILWINDCSS_OUTPUTS_MAX_AGE
+    )
 
     # Configure jinja2
     jinja_env.loader = FileSystemLoader(build_path)
@@ -58,6 +130,8 @@ def configure(
         build_path=build_path,
         tailwindcss_binaries_path=tailwindcss_binaries_path,
         tailwindcss_path=tailwindcss_path,
+        tailwindcss_platform=tailwindcss_platform,
+        tailwindcss_outputs_path=tailwindcss_outputs_path,
         tailwindcss_version=tailwindcss_version,
         manage_path=manage_path,
         venv_path=venv_path,
@@ -86,73 +160,132 @@ def build(
     tailwindcss_output_file_path = build_path / "example/static/css/tailwind.css"
     static_root_path = build_path / "staticfiles"
     tailwindcss_path = config["tailwindcss_path"]
+    tailwindcss_outputs_path = config["tailwindcss_outputs_path"]
     app_service_path = (
         build_path / "app.service"
     )  # Invalid systemd unit path for demonstration
     app_env_path = build_path / "env"
     tailwindcss_version = config["tailwindcss_version"]
+    tailwindcss_platform = config["tailwindcss_platform"]
     manage_path = config["manage_path"]
     venv_path = config["venv_path"]
     granian_path = venv_path / "bin/granian"
-    environ = {**os.environ}
+    environ = ENVIRON
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = []
 
-    # Download tailwindcss if it does not exist
-    if not tailwindcss_path.exists():
-        logger.info(f"Downloading tailwindcss '{tailwindcss_version}' standalone")
+        # Download tailwindcss if it does not exist
+        if not tailwindcss_path.exists():
+            logger.info(f"Downloading tailwindcss '{tailwindcss_version}' standalone")
 
-        download_tailwindcss_standalone(
-            version=tailwindcss_version, path=tailwindcss_path
+            futures.append(
+                executor.submit(
+                    download_tailwindcss_standalone,
+                    version=tailwindcss_version,
+                    path=tailwindcss_path,
+                    platform=tailwindcss_platform,
+                    sha256=TAILWINDCSS_SHA256.get(
+                        (tailwindcss_version, tailwindcss_platform)
+                    ),
+                )
+            )
+
+        futures.append(
+            executor.submit(
+                git_checkout_ref_sha,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                build_path=build_path,
+                environ=environ,
+            )
         )
+        wait_for_results(futures)
 
-    # Run the process
-    git_checkout_ref_sha(
-        ref_sha=ref_sha,
-        repo_path=repo_path,
-        build_path=build_path,
-        environ=environ,
-    )
-    create_venv_with_uv(
-        build_path=build_path,
-        venv_path=venv_path,
-        venv_prompt=venv_prompt,
-        uv_path=uv_path,
-        environ=environ,
-    )
-    pip_install_with_uv(
-        build_path=build_path,
-        venv_path=venv_path,
-        requirements_list=[f"-r {requirements_path}"],
-        uv_path=uv_path,
-        environ=environ,
-    )
-    render_template_and_save(
-        path=app_env_path,
-        template_name="example/services/env",
-        jinja_env=jinja_env,
-        static_root_path=static_root_path,
-        tailwindcss_version=tailwindcss_version,
-        environ=environ,
-    )
-    render_template_and_save(
-        path=app_service_path,
-        template_name="example/services/app.service",
-        jinja_env=jinja_env,
-        granian_path=granian_path,
-        working_dir_path=build_path,
-        environ=environ,
-    )
-    tailwindcss_build_and_minify(
-        build_path=build_path,
-        input_file=tailwindcss_input_file_path,
-        output_file=tailwindcss_output_file_path,
-        tailwindcss_path=tailwindcss_path,
-        environ=environ,
-    )
+        # Reuse a previously compiled stylesheet when none of its sources changed,
+        # outputs are stored under the digest of the input and scanned files
+        tailwindcss_source_file_paths = [
+            path
+            for source_glob in TAILWINDCSS_SOURCE_GLOBS
+            for path in build_path.glob(source_glob)
+            if path.is_file()
+        ]
+        tailwindcss_digest = get_files_digest(
+            paths=[tailwindcss_input_file_path, *tailwindcss_source_file_paths],
+            prefix=tailwindcss_version,
+            root=build_path,
+        )
+        tailwindcss_cached_path = tailwindcss_outputs_path / f"{tailwindcss_digest}.css"
+        tailwindcss_cache_hit = tailwindcss_cached_path.exists()
+
+        # Compile the service templates once, up front, for the render workers
+        env_template = jinja_env.get_template("example/services/env")
+        app_service_template = jinja_env.get_template("example/services/app.service")
+
+        # Everything below only depends on the checkout, so run it side by side
+        futures = [
+            executor.submit(
+                create_venv_and_install_dependencies,
+                build_path=build_path,
+                venv_path=venv_path,
+                venv_prompt=venv_prompt,
+                requirements_path=requirements_path,
+                environ=environ,
+            ),
+            executor.submit(
+                render_template_and_save,
+                path=app_env_path,
+                template_name="example/services/env",
+                jinja_env=jinja_env,
+                template=env_template,
+                static_root_path=static_root_path,
+                tailwindcss_version=tailwindcss_version,
+                environ=environ,
+            ),
+            executor.submit(
+                render_template_and_save,
+                path=app_service_path,
+                template_name="example/services/app.service",
+                jinja_env=jinja_env,
+                template=app_service_template,
+                granian_path=granian_path,
+                working_dir_path=build_path,
+                environ=environ,
+            ),
+        ]
+
+        if tailwindcss_cache_hit:
+            logger.info(f"Reusing cached tailwind css '{tailwindcss_digest}'")
+            os.utime(tailwindcss_cached_path)
+            hardlink_or_copy(
+                source=tailwindcss_cached_path, target=tailwindcss_output_file_path
+            )
+        else:
+            futures.append(
+                executor.submit(
+                    tailwindcss_build_and_minify,
+                    build_path=build_path,
+                    input_file=tailwindcss_input_file_path,
+                    output_file=tailwindcss_output_file_path,
+                    tailwindcss_path=tailwindcss_path,
+                    environ=environ,
+                )
+            )
+
+        wait_for_results(futures)
+
+    if not tailwindcss_cache_hit:
+        hardlink_or_copy(
+            source=tailwindcss_output_file_path, target=tailwindcss_cached_path
+        )
+
+    # Runs last as it collects the compiled tailwind css
     django_collectstatic(
         build_path=build_path,
         manage_path=manage_path,
         venv_path=venv_path,
         environ=environ,
+        ignore_patterns=["node_modules", "*.scss", "*.jsx", "*.map", "tests", "test"],
     )
 
 
@@ -171,7 +304,7 @@ def release(
     venv_path = config["venv_path"]
     manage_path = config["manage_path"]
     latest_build_path = config["latest_build_path"]
-    environ = {**os.environ}
+    environ = ENVIRON
 
     django_check(
         build_path=build_path,
@@ -213,4 +346,5 @@ def post_release(
         exclude_paths=[latest_build_path],
         keep_builds=2,
         log_title="Removing stale builds",
+        repo_path=repo_path,
     )
@@ -1,170 +1,255 @@
 """A build system for django projects (Maybe others too)."""
 
+from __future__ import annotations
+
 import argparse
-import ast
 import datetime
-import importlib.resources
+import functools
+import hashlib
 import logging
 import os
-import shlex
-import subprocess
+import pathlib
 import sys
 import time
+import typing as t
 from importlib.metadata import version as get_version
-from jinja2 import Environment
 
 from bou.contrib import (
     Cache,
     Db,
     ProcessAction,
     ProcessState,
+    Snapshot,
     SnapshotManager,
     SubProcess,
     chmod_executable,
+    format_box_table,
     get_is_bare_repo,
     get_ref_sha,
     get_resolved_path_absolute,
+    get_user_cache_path,
     is_pid_alive,
     load_module_from_path,
+    remove_expired_files,
     time_and_log,
-    which_or_raise,
 )
 from bou.errors import BuildError
-from bou.fpi import BuildPlugin, BuildSpec, pm
+from bou.fpi import BuildPlugin, BuildSpec, Config, pm, validate_config
+
+# Modules only needed by some handlers are imported lazily to keep the cold start
+# of the post-receive hook and the db command fast
+if t.TYPE_CHECKING:
+    import ast
+
+    from jinja2 import Environment, Template
+    from pluggy import HookCaller
 
 logger = logging.getLogger("bou")
 logging.basicConfig(level=logging.INFO)
 
+HOOK_NAMES = frozenset(
+    {
+        "configure",
+        "pre_build",
+        "build",
+        "post_build",
+        "pre_release",
+        "release",
+        "post_release",
+    }
+)
+
+# Header of generated build systems, the hook implementations are appended to it
+BUILD_SYSTEM_SKELETON_SOURCE = """\
+import logging
+import pathlib
+from jinja2 import Environment, FileSystemLoader
+from bou.fpi import hookimpl_v1, Config
+from bou.contrib import Cache
+logger = logging.getLogger("bou")
+"""
+
+
+@functools.cache
+def get_build_system_skeleton() -> ast.Module:
+    """Parse the generated build system header once per process."""
+    import ast
+
+    return ast.parse(BUILD_SYSTEM_SKELETON_SOURCE)
+
+
+@functools.cache
+def get_jinja_env() -> Environment:
+    """Get the jinja environment shared across handlers.
+
+    Templates are compiled once per process and never re-checked for changes on
+    disk.
+    """
+    from jinja2 import Environment
+
+    return Environment(auto_reload=False, cache_size=-1)
+
+
+@functools.cache
+def get_package_resource(name: str) -> str:
+    """Read a file shipped with the bou package, once per process."""
+    import importlib.resources
+
+    path = importlib.resources.files("bou") / name
+    return path.read_text()
+
+
+# Compiled templates which have not been rewritten for 30 days are pruned
+JINJA_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+
+@functools.lru_cache
+def get_hook_template(hook_content: str) -> Template:
+    """Compile the post-receive hook template, memoized on its content."""
+
+    return get_jinja_env().from_string(hook_content)
+
+
+def set_jinja_bytecode_cache(jinja_env: Environment, db_path: pathlib.Path) -> None:
+    """Persist compiled template bytecode between hook invocations.
+
+    The cache lives alongside the bou database unless overridden with the
+    BOU_JINJA_CACHE_DIR environment variable.
+
+    Build systems load templates from a checkout per ref sha, so entries are
+    keyed on the template name alone rather than its absolute filename. Jinja
+    compares a checksum of the source before using an entry, so a changed
+    template is recompiled and overwrites it. Entries not written for
+    JINJA_CACHE_MAX_AGE seconds are pruned.
+    """
+
+    cache_path = get_resolved_path_absolute(
+        os.environ.get("BOU_JINJA_CACHE_DIR", db_path.parent / "jinja_cache")
+    )
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    remove_expired_files(path=cache_path, max_age=JINJA_CACHE_MAX_AGE, suffix=".cache")
+
+    from jinja2 import FileSystemBytecodeCache
+
+    class TemplateNameBytecodeCache(FileSystemBytecodeCache):
+        def get_cache_key(self, name: str, filename: str | None = None) -> str:
+            return super().get_cache_key(name)
+
+    jinja_env.bytecode_cache = TemplateNameBytecodeCache(
+        directory=f"{cache_path}", pattern="__jinja2_%s.cache"
+    )
+
+
+def generate_build_system_source() -> str:
+    """Generate the source of an empty build system from the plugin interface."""
+    import ast
+    import copy
+
+    bou_ast = ast.parse(get_package_resource("fpi.py"))
+
+    module = copy.deepcopy(get_build_system_skeleton())
+    module_body = module.body
+
+    for node in bou_ast.body:
+        if not (isinstance(node, ast.ClassDef) and node.name == "BuildPlugin"):
+            continue
+
+        for child in node.body:
+            if not (isinstance(child, ast.FunctionDef) and child.name in HOOK_NAMES):
+                continue
+
+            child.args.args = [arg for arg in child.args.args if arg.arg != "self"]
+            if child.name == "configure":
+                child.returns = ast.Name(id="Config")
+                child.body = [
+                    ast.Assign(
+                        targets=[ast.Name(id="build_path")],
+                        value=ast.Call(
+                            func=ast.Attribute(
+                                value=ast.Name(id="pathlib"),
+                                attr="Path",
+                            ),
+                            args=[ast.Constant(value="/tmp/bou/builds")],
+                        ),
+                        lineno=0,
+                    ),
+                    ast.Assign(
+                        targets=[
+                            ast.Attribute(
+                                value=ast.Name(id="jinja_env"),
+                                attr="loader",
+                            )
+                        ],
+                        value=ast.Call(
+                            func=ast.Name(id="FileSystemLoader"),
+                            args=[ast.Name(id="build_path")],
+                        ),
+                        lineno=0,
+                    ),
+                    ast.Return(
+                        value=ast.Call(
+                            func=ast.Name(id="Config"),
+                            keywords=[
+                                ast.keyword(
+                                    arg="build_path",
+                                    value=ast.Name(id="build_path"),
+                                ),
+                            ],
+                        )
+                    ),
+                ]
+            else:
+                child.body = [ast.Expr(ast.Constant(...))]
+
+            decorator_list = []
+            for decorator in child.decorator_list:
+                match decorator:
+                    case ast.Call(
+                        func=ast.Name(id="hookimpl_v1"),
+                        keywords=[ast.keyword(arg="tryfirst" | "trylast" | "wrapper")],
+                    ):
+                        func = decorator.func
+                        decorator_list.append(func)
+
+            child.decorator_list = decorator_list
+
+            module_body.append(child)
+        break
+
+    return ast.unparse(module)
+
 
 def init_build_system_handler(args: argparse.Namespace) -> None:
-    """Create an empty build system file."""
+    """Create an empty build system file.
+
+    The generated source is cached per user, keyed on the sources it is generated
+    from, so the plugin interface is only parsed and transformed once per version.
+    """
 
     build_file = args.build_file
-    path = importlib.resources.files("bou") / "fpi.py"
-    bou_ast = ast.parse(path.read_text())
-
-    module_body: list[ast.stmt] = [
-        ast.Import(names=[ast.alias(name="logging")]),
-        ast.Import(names=[ast.alias(name="pathlib")]),
-        ast.ImportFrom(
-            module="jinja2",
-            names=[ast.alias(name="Environment"), ast.alias(name="FileSystemLoader")],
-            level=0,
-        ),
-        ast.ImportFrom(
-            module="bou.fpi",
-            names=[ast.alias(name="hookimpl_v1"), ast.alias(name="Config")],
-            level=0,
-        ),
-        ast.ImportFrom(
-            module="bou.contrib",
-            names=[ast.alias(name="Cache")],
-            level=0,
-        ),
-        ast.Assign(
-            targets=[ast.Name(id="logger")],
-            value=ast.Call(
-                func=ast.Attribute(value=ast.Name(id="logging"), attr="getLogger"),
-                args=[ast.Constant(value="bou")],
-                keywords=[],
-            ),
-            lineno=5,
-        ),
-    ]
-    for node in ast.walk(bou_ast):
-        match node:
-            case ast.ClassDef(name="BuildPlugin"):
-                for child in node.body:
-                    match child:
-                        case ast.FunctionDef(
-                            name="pre_build"
-                            | "build"
-                            | "post_build"
-                            | "configure"
-                            | "pre_release"
-                            | "release"
-                            | "post_release"
-                        ):
-                            child.args.args = [
-                                arg for arg in child.args.args if arg.arg != "self"
-                            ]
-                            if child.name == "configure":
-                                child.returns = ast.Name(id="Config")
-                                child.body = [
-                                    ast.Assign(
-                                        targets=[ast.Name(id="build_path")],
-                                        value=ast.Call(
-                                            func=ast.Attribute(
-                                                value=ast.Name(id="pathlib"),
-                                                attr="Path",
-                                            ),
-                                            args=[
-                                                ast.Constant(value="/tmp/bou/builds")
-                                            ],
-                                        ),
-                                        lineno=0,
-                                    ),
-                                    ast.Assign(
-                                        targets=[
-                                            ast.Attribute(
-                                                value=ast.Name(id="jinja_env"),
-                                                attr="loader",
-                                            )
-                                        ],
-                                        value=ast.Call(
-                                            func=ast.Name(id="FileSystemLoader"),
-                                            args=[ast.Name(id="build_path")],
-                                        ),
-                                        lineno=0,
-                                    ),
-                                    ast.Return(
-                                        value=ast.Call(
-                                            func=ast.Name(id="Config"),
-                                            keywords=[
-                                                ast.keyword(
-                                                    arg="build_path",
-                                                    value=ast.Name(id="build_path"),
-                                                ),
-                                            ],
-                                        )
-                                    ),
-                                ]
-                            else:
-                                child.body = [ast.Expr(ast.Constant(...))]
-
-                            decorator_list = []
-                            for decorator in child.decorator_list:
-                                match decorator:
-                                    case ast.Call(
-                                        func=ast.Name(id="hookimpl_v1"),
-                                        keywords=[
-                                            ast.keyword(arg="tryfirst" | "wrapper")
-                                        ],
-                                    ):
-                                        func = decorator.func
-                                        decorator_list.append(func)
-
-                            child.decorator_list = decorator_list
-
-                            module_body.append(child)
-                        case _:
-                            continue
-                break
-            case _:
-                continue
 
-    code = ast.unparse(ast.Module(module_body))
-    build_file.write_text(code)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(get_package_resource("fpi.py").encode())
+    hasher.update(get_package_resource("cli.py").encode())
+    cache_path = get_user_cache_path() / f"init_template_{hasher.hexdigest()}.py"
 
-    logger.info(f"Generated build system {build_file}")
+    if cache_path.exists():
+        code = cache_path.read_text()
+    else:
+        code = generate_build_system_source()
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(code)
+        tmp_path.replace(cache_path)
 
     try:
-        # Try and format the output with ruff
+        # Try and format the output with ruff, piping the code through stdin
         cwd = None
         environ = {}
         description = "Formatting generated code with ruff"
         error_prefix = "Failed to reformat generated file with ruff "
-        command = shlex.split(f"ruff format {build_file}")
+        command = ["ruff", "format", "--stdin-filename", f"{build_file}", "-"]
 
         process = SubProcess(
             description=description,
@@ -172,11 +257,18 @@ def init_build_system_handler(args: argparse.Namespace) -> None:
             environ=environ,
             cwd=cwd,
             error_prefix=error_prefix,
+            stdin=code,
+            log_stdout=False,
         )
-        process.run()
+        code = process.run()
     except FileNotFoundError:
         pass
 
+    with build_file.open("w", encoding="utf-8") as stream:
+        stream.write(code)
+
+    logger.info(f"Generated build system {build_file}")
+
 
 def install_handler(args: argparse.Namespace) -> None:
     """Install a build file as git hook."""
@@ -192,11 +284,9 @@ def install_handler(args: argparse.Namespace) -> None:
         logger.error(f"Build file {build_file_path} does not exist.")
         sys.exit(1)
 
-    hook_path = importlib.resources.files("bou") / "post-receive"
-    hook_content = hook_path.read_text()
+    hook_content = get_package_resource("post-receive")
 
-    jinja_env = Environment()
-    hook_template = jinja_env.from_string(hook_content)
+    hook_template = get_hook_template(hook_content)
 
     # TODO @feature add different strategies i.e. release on tag, qa etc
     rendered_hook_template = hook_template.render(
@@ -211,8 +301,50 @@ def install_handler(args: argparse.Namespace) -> None:
     chmod_executable(path=install_path)
 
 
-def build_handler(args: argparse.Namespace) -> None:
-    """Run the build process."""
+class ProcessContext(t.NamedTuple):
+    """Models the state shared by the hooks of a build or release process."""
+
+    ref: str
+    ref_sha: str
+    user: str
+    repo_path: pathlib.Path
+    builds_path: pathlib.Path
+    build_path: pathlib.Path
+    jinja_env: Environment
+    config: Config
+    cache: Cache
+    snapshot: Snapshot
+    snapshot_manager: SnapshotManager
+    current_datetime: datetime.datetime
+
+
+def get_has_build_system_hookimpls(hook_caller: HookCaller) -> bool:
+    """Return True if the hook is implemented by more than the base plugin.
+
+    The base plugin hooks are no-ops, so their dispatch can be skipped.
+    """
+    return any(
+        not isinstance(hookimpl.plugin, BuildPlugin)
+        for hookimpl in hook_caller.get_hookimpls()
+    )
+
+
+@functools.cache
+def load_build_system(build_file_path: pathlib.Path) -> None:
+    """Register the build system with the plugin manager, once per process."""
+
+    plugin_module = load_module_from_path(build_file_path)
+    pm.add_hookspecs(BuildSpec)
+    pm.register(BuildPlugin())
+    pm.register(plugin_module)
+    pm.check_pending()
+
+
+def prepare_process(args: argparse.Namespace, action: ProcessAction) -> ProcessContext:
+    """Validate the environment, claim the snapshot and configure the build system.
+
+    If the snapshot can not be claimed for the action the process exits.
+    """
 
     ref = args.ref
     user = args.user
@@ -220,11 +352,9 @@ def build_handler(args: argparse.Namespace) -> None:
     repo_path = args.repo_path
     db_path = args.db_path
     build_file_path = args.build_file_path
-    schedule_release = args.schedule_release
     current_datetime = datetime.datetime.now(datetime.UTC)
-    ref_sha = get_ref_sha(repo_path=repo_path, ref=ref, environ={})
     pid = os.getpid()
-    jinja_env = Environment()
+    jinja_env = get_jinja_env()
 
     if not repo_path.exists():
         logger.error("Repository does not exist.")
@@ -244,14 +374,12 @@ def build_handler(args: argparse.Namespace) -> None:
 
     db = Db.init_with_defaults(db_path=db_path)
     cache = Cache(db)
+    set_jinja_bytecode_cache(jinja_env=jinja_env, db_path=db_path)
     snapshot_manager = SnapshotManager(db)
+    ref_sha = get_ref_sha(repo_path=repo_path, ref=ref, environ={}, cache=cache)
 
     # Load the build system
-    plugin_module = load_module_from_path(build_file_path)
-    pm.add_hookspecs(BuildSpec)
-    pm.register(BuildPlugin())
-    pm.register(plugin_module)
-    pm.check_pending()
+    load_build_system(build_file_path)
 
     snapshot = snapshot_manager.get(ref_sha=ref_sha)
 
@@ -259,7 +387,7 @@ def build_handler(args: argparse.Namespace) -> None:
         snapshot = snapshot_manager.create(
             ref=ref,
             ref_sha=ref_sha,
-            action=ProcessAction.BUILD,
+            action=action,
             state=ProcessState.RUNNING,
             current_datetime=current_datetime,
             user=user,
@@ -268,7 +396,7 @@ def build_handler(args: argparse.Namespace) -> None:
         # If we are unable to create a snapshot another process beat us to it
         if not snapshot:
             message = (
-                f"Unable to create build snapshot for '{ref_sha}', "
+                f"Unable to create {action} snapshot for '{ref_sha}', "
                 " another process beat you too it. "
                 "process will exit shortly"
             )
@@ -288,7 +416,7 @@ def build_handler(args: argparse.Namespace) -> None:
     elif pid != snapshot.pid and not snapshot_pid_is_alive:
         snapshot = snapshot_manager.adopt_into_running_state(
             snapshot=snapshot,
-            action=ProcessAction.BUILD,
+            action=action,
             current_datetime=current_datetime,
             user=user,
             pid=pid,
@@ -304,10 +432,10 @@ def build_handler(args: argparse.Namespace) -> None:
             sys.exit(0)
         else:
             logger.info(
-                f"Optimistic lock acquisition race won for snapshot '{ref_sha}', build will begin shortly"
+                f"Optimistic lock acquisition race won for snapshot '{ref_sha}', {action} will begin shortly"
             )
 
-    if snapshot.action != ProcessAction.BUILD:
+    if snapshot.action != action:
         message = (
             f"An existing {snapshot.action} is running for '{ref_sha}' please try again when it completes, "
             "process will exit shortly"
@@ -324,42 +452,79 @@ def build_handler(args: argparse.Namespace) -> None:
             jinja_env=jinja_env,
             cache=cache,
         )
+        config = validate_config(config)
 
-    build_path = config["build_path"]
+    return ProcessContext(
+        ref=ref,
+        ref_sha=ref_sha,
+        user=user,
+        repo_path=repo_path,
+        builds_path=builds_path,
+        build_path=config["build_path"],
+        jinja_env=jinja_env,
+        config=config,
+        cache=cache,
+        snapshot=snapshot,
+        snapshot_manager=snapshot_manager,
+        current_datetime=current_datetime,
+    )
 
-    with time_and_log(message_prefix="Pre-build execution time "):
-        pm.hook.pre_build(
-            ref=ref,
-            ref_sha=ref_sha,
-            repo_path=repo_path,
-            builds_path=builds_path,
-            build_path=build_path,
-            jinja_env=jinja_env,
-            config=config,
-            cache=cache,
-        )
-    with time_and_log(message_prefix="Build execution time "):
-        pm.hook.build(
-            ref=ref,
-            ref_sha=ref_sha,
-            repo_path=repo_path,
-            builds_path=builds_path,
-            build_path=build_path,
-            jinja_env=jinja_env,
-            config=config,
-            cache=cache,
-        )
-    with time_and_log(message_prefix="Post-build execution time "):
-        pm.hook.post_build(
-            ref=ref,
-            ref_sha=ref_sha,
-            repo_path=repo_path,
-            builds_path=builds_path,
-            build_path=build_path,
-            jinja_env=jinja_env,
-            config=config,
-            cache=cache,
-        )
+
+def build_handler(args: argparse.Namespace) -> None:
+    """Run the build process."""
+
+    schedule_release = args.schedule_release
+    context = prepare_process(args=args, action=ProcessAction.BUILD)
+
+    ref = context.ref
+    ref_sha = context.ref_sha
+    user = context.user
+    repo_path = context.repo_path
+    builds_path = context.builds_path
+    build_path = context.build_path
+    jinja_env = context.jinja_env
+    config = context.config
+    cache = context.cache
+    snapshot = context.snapshot
+    snapshot_manager = context.snapshot_manager
+    current_datetime = context.current_datetime
+
+    if get_has_build_system_hookimpls(pm.hook.pre_build):
+        with time_and_log(message_prefix="Pre-build execution time "):
+            pm.hook.pre_build(
+                ref=ref,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                builds_path=builds_path,
+                build_path=build_path,
+                jinja_env=jinja_env,
+                config=config,
+                cache=cache,
+            )
+    if get_has_build_system_hookimpls(pm.hook.build):
+        with time_and_log(message_prefix="Build execution time "):
+            pm.hook.build(
+                ref=ref,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                builds_path=builds_path,
+                build_path=build_path,
+                jinja_env=jinja_env,
+                config=config,
+                cache=cache,
+            )
+    if get_has_build_system_hookimpls(pm.hook.post_build):
+        with time_and_log(message_prefix="Post-build execution time "):
+            pm.hook.post_build(
+                ref=ref,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                builds_path=builds_path,
+                build_path=build_path,
+                jinja_env=jinja_env,
+                config=config,
+                cache=cache,
+            )
 
     if not schedule_release:
         snapshot_manager.complete(
@@ -390,117 +555,20 @@ def release_handler(args: argparse.Namespace) -> None:
     releases sequentially.
     """
 
-    ref = args.ref
-    user = args.user
-    build_file_path = args.build_file_path
-    builds_path = args.builds_path
-    repo_path = args.repo_path
-    db_path = args.db_path
-    pid = os.getpid()
-    jinja_env = Environment()
-    ref_sha = get_ref_sha(repo_path=repo_path, ref=ref, environ={})
-    current_datetime = datetime.datetime.now(datetime.UTC)
-
-    if not repo_path.exists():
-        logger.error("Repository does not exist.")
-        sys.exit(1)
-
-    git_repo_is_bare = get_is_bare_repo(repo_path=repo_path, environ={})
-
-    if not git_repo_is_bare:
-        logger.error(
-            f"Repository does not exist, did you run 'git -C {repo_path} init --bare'?."
-        )
-        sys.exit(1)
-
-    if not builds_path.exists():
-        logger.error(f"Builds path does not exist '{builds_path}'.")
-        sys.exit(1)
-
-    # Load the build system
-    plugin_module = load_module_from_path(build_file_path)
-    pm.add_hookspecs(BuildSpec)
-    pm.register(BuildPlugin())
-    pm.register(plugin_module)
-    pm.check_pending()
-
-    db = Db.init_with_defaults(db_path=db_path)
-    cache = Cache(db)
-    snapshot_manager = SnapshotManager(db)
-
-    snapshot = snapshot_manager.get(ref_sha=ref_sha)
-
-    if not snapshot:
-        snapshot = snapshot_manager.create(
-            ref=ref,
-            ref_sha=ref_sha,
-            action=ProcessAction.RELEASE,
-            state=ProcessState.RUNNING,
-            current_datetime=current_datetime,
-            user=user,
-            pid=pid,
-        )
-        # If we are unable to create a snapshot another process beat us to it
-        if not snapshot:
-            message = (
-                f"Unable to create release snapshot for '{ref_sha}', "
-                " another process beat you too it. "
-                "process will exit shortly"
-            )
-            logger.info(message)
-            sys.exit(0)
-
-    # A pid could be the same as a historical one that is dead, so always check if the snapshot pid is alive
-    snapshot_pid_is_alive = is_pid_alive(snapshot.pid)
-
-    if pid != snapshot.pid and snapshot_pid_is_alive:
-        message = (
-            f"An existing {snapshot.action} is running for '{ref_sha}' please try again when it completes, "
-            "process will exit shortly"
-        )
-        logger.info(message)
-        sys.exit(0)
-    elif pid != snapshot.pid and not snapshot_pid_is_alive:
-        snapshot = snapshot_manager.adopt_into_running_state(
-            snapshot=snapshot,
-            action=ProcessAction.RELEASE,
-            current_datetime=current_datetime,
-            user=user,
-            pid=pid,
-        )
-
-        if not snapshot:
-            message = (
-                f"Optimistic lock acquisition race lost for snapshot '{ref_sha}', "
-                " another process beat you too it. "
-                "process will exit shortly"
-            )
-            logger.info(message)
-            sys.exit(0)
-        else:
-            logger.info(
-                f"Optimistic lock acquisition race won for snapshot '{ref_sha}', build will begin shortly"
-            )
-
-    if snapshot.action != ProcessAction.RELEASE:
-        message = (
-            f"An existing {snapshot.action} is running for '{ref_sha}' please try again when it completes, "
-            "process will exit shortly"
-        )
-        logger.info(message)
-        sys.exit(0)
-
-    with time_and_log(message_prefix="Configuration execution time "):
-        config = pm.hook.configure(
-            ref=ref,
-            ref_sha=ref_sha,
-            builds_path=builds_path,
-            repo_path=repo_path,
-            jinja_env=jinja_env,
-            cache=cache,
-        )
-
-    build_path = config["build_path"]
+    context = prepare_process(args=args, action=ProcessAction.RELEASE)
+
+    ref = context.ref
+    ref_sha = context.ref_sha
+    user = context.user
+    repo_path = context.repo_path
+    builds_path = context.builds_path
+    build_path = context.build_path
+    jinja_env = context.jinja_env
+    config = context.config
+    cache = context.cache
+    snapshot = context.snapshot
+    snapshot_manager = context.snapshot_manager
+    current_datetime = context.current_datetime
 
     if not build_path.exists():
         logger.error(f"Build for {ref_sha} does not exist, will abandon release.")
@@ -509,41 +577,44 @@ def release_handler(args: argparse.Namespace) -> None:
         )
         sys.exit(1)
 
-    with time_and_log(message_prefix="Pre-release execution time "):
-        pm.hook.pre_release(
-            ref=ref,
-            ref_sha=ref_sha,
-            repo_path=repo_path,
-            builds_path=builds_path,
-            build_path=build_path,
-            jinja_env=jinja_env,
-            config=config,
-            cache=cache,
-        )
+    if get_has_build_system_hookimpls(pm.hook.pre_release):
+        with time_and_log(message_prefix="Pre-release execution time "):
+            pm.hook.pre_release(
+                ref=ref,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                builds_path=builds_path,
+                build_path=build_path,
+                jinja_env=jinja_env,
+                config=config,
+                cache=cache,
+            )
 
-    with time_and_log(message_prefix="Release execution time "):
-        pm.hook.release(
-            ref=ref,
-            ref_sha=ref_sha,
-            repo_path=repo_path,
-            builds_path=builds_path,
-            build_path=build_path,
-            jinja_env=jinja_env,
-            config=config,
-            cache=cache,
-        )
+    if get_has_build_system_hookimpls(pm.hook.release):
+        with time_and_log(message_prefix="Release execution time "):
+            pm.hook.release(
+                ref=ref,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                builds_path=builds_path,
+                build_path=build_path,
+                jinja_env=jinja_env,
+                config=config,
+                cache=cache,
+            )
 
-    with time_and_log(message_prefix="Post-release execution time "):
-        pm.hook.post_release(
-            ref=ref,
-            ref_sha=ref_sha,
-            repo_path=repo_path,
-            builds_path=builds_path,
-            build_path=build_path,
-            jinja_env=jinja_env,
-            config=config,
-            cache=cache,
-        )
+    if get_has_build_system_hookimpls(pm.hook.post_release):
+        with time_and_log(message_prefix="Post-release execution time "):
+            pm.hook.post_release(
+                ref=ref,
+                ref_sha=ref_sha,
+                repo_path=repo_path,
+                builds_path=builds_path,
+                build_path=build_path,
+                jinja_env=jinja_env,
+                config=config,
+                cache=cache,
+            )
 
     # Set the snapshot as completed
     snapshot_manager.complete(
@@ -562,53 +633,47 @@ def db_handler(args: argparse.Namespace) -> None:
     db_path = args.db_path
 
     # Initialize the database if necessary
-    Db.init_with_defaults(db_path=db_path)
-
-    sqlite_path = which_or_raise("sqlite3")
+    db = Db.init_with_defaults(db_path=db_path)
 
+    # The table and order are restricted by the argument parser choices
     if table == "snapshot":
-        sql_base = "(SELECT * FROM snapshot ORDER BY ref_sha, efd)"
+        sql_base = "snapshot"
     else:
-        sql_base = "(SELECT * FROM snapshot UNION SELECT * FROM snapshot_history ORDER BY ref_sha, efd)"
-
-
-    if not query:
-        sql = f"SELECT * FROM {sql_base} ORDER BY ref_sha, efd\n"
-    else:
-        sql = f"""
-        SELECT * FROM {sql_base}\n WHERE ref_sha LIKE '%{query}%'
-        """
+        sql_base = "(SELECT * FROM snapshot UNION SELECT * FROM snapshot_history)"
 
     if order:
-        sql += f"ORDER BY created_at {order}\n"
-
-    if limit:
-        sql += f"LIMIT {limit}"
-
-    command = shlex.split(f'{sqlite_path} -box {db_path} "{sql}"')
-
-    if refresh:
-        while True:
-            result = subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-            sys.stdout.write(result.stdout)
-            sys.stdout.flush()
-
-            try:
-                time.sleep(refresh)
-            except KeyboardInterrupt:
-                break
-
-            os.system("clear")
+        sql_order = f"created_at {order}"
     else:
-        subprocess.run(
-            command,
-            check=True,
-        )
+        sql_order = "ref_sha, efd"
+
+    sql = f"""
+    SELECT *
+    FROM {sql_base}
+    WHERE ref_sha LIKE :query
+    ORDER BY {sql_order}
+    LIMIT :limit
+    """
+    params = {
+        "query": f"%{query or ''}%",
+        "limit": limit or -1,
+    }
+
+    while True:
+        cursor = db.conn.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        sys.stdout.write(format_box_table(names=names, rows=cursor.fetchall()))
+        sys.stdout.flush()
+
+        if not refresh:
+            break
+
+        try:
+            time.sleep(refresh)
+        except KeyboardInterrupt:
+            break
+
+        # Move the cursor home and clear the screen and scrollback
+        sys.stdout.write("\x1b[H\x1b[2J\x1b[3J")
 
 
 def add_common_parse_args(parser: argparse.ArgumentParser) -> None:
@@ -1,17 +1,22 @@
 """Bou utility functions."""
 
+from __future__ import annotations
+
 import tempfile
+import concurrent.futures
 import contextlib
 import datetime
 import enum
 import errno
 import fcntl
+import functools
 import hashlib
 import importlib.util
+import json
 import logging
 import os
 import pathlib
-import shlex
+import re
 import shutil
 import sqlite3
 import stat
@@ -19,13 +24,14 @@ import subprocess
 import textwrap
 import time
 import typing as t
-import urllib.request
 from types import ModuleType
 
-from jinja2 import Environment
-
 from bou.errors import BuildError, DependencyError
 
+# jinja2 and urllib are only imported where needed to keep the CLI start up fast
+if t.TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,15 +54,24 @@ class ProcessState(enum.StrEnum):
 class Db:
     def __init__(self, conn: sqlite3.Connection) -> None:
         self.conn = conn
+        self.transaction_depth = 0
 
     @staticmethod
-    def datetime_converter(value: bytes) -> datetime.datetime:
-        return datetime.datetime.fromisoformat(value.decode())
+    def datetime_adapter(value: datetime.datetime) -> str:
+        return value.isoformat(" ")
+
+    @staticmethod
+    def enum_adapter(value: enum.StrEnum) -> str:
+        return value.value
 
     @classmethod
     def init_with_defaults(cls, db_path: pathlib.Path) -> "Db":
-        conn = sqlite3.connect(db_path)
-        sqlite3.register_converter("DATETIME", Db.datetime_converter)
+        # Column types are not detected, datetimes are read back as ISO strings
+        # and only parsed by consumers which need them
+        conn = sqlite3.connect(db_path, detect_types=0)
+        sqlite3.register_adapter(datetime.datetime, Db.datetime_adapter)
+        sqlite3.register_adapter(ProcessAction, Db.enum_adapter)
+        sqlite3.register_adapter(ProcessState, Db.enum_adapter)
 
         commit_sql = """
         CREATE TABLE IF NOT EXISTS snapshot (
@@ -130,22 +145,40 @@ class Db:
         """
 
         with conn:
+            # page_size only applies to an empty database and must be set before
+            # switching to WAL mode
+            conn.execute("PRAGMA page_size = 4096")
             conn.execute("PRAGMA journal_mode = WAL")
             conn.execute("PRAGMA synchronous = NORMAL")
             conn.execute("PRAGMA foreign_keys = ON")
             conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -65536")
+            conn.execute("PRAGMA mmap_size = 268435456")
 
             conn.execute(commit_sql)
             conn.execute(commit_history_sql)
             conn.execute(commit_history_trigger_sql)
             conn.execute(cache_sql)
 
+            # Gathers planner statistics only when they are missing or stale
+            conn.execute("PRAGMA optimize = 0x10002")
+
         return cls(conn)
 
     @staticmethod
+    @functools.cache
     def row_factory_wrapper[T](
         model_class: type[T],
     ) -> t.Callable[[sqlite3.Cursor, sqlite3.Row], T]:
+        """Get a row factory for the model class.
+
+        Named tuples are built positionally so their fields must be declared in
+        the same order as the columns of the query.
+        """
+        make = getattr(model_class, "_make", None)
+        if make is not None:
+            return lambda cursor, record: make(record)
+
         def wrapper(cursor: sqlite3.Cursor, record: sqlite3.Row) -> T:
             names = [column[0] for column in cursor.description]
             kwargs = dict(zip(names, record))
@@ -153,6 +186,28 @@ class Db:
 
         return wrapper
 
+    @contextlib.contextmanager
+    def transaction(self) -> t.Generator[None, None, None]:
+        """Run the enclosed statements in a single transaction.
+
+        Transactions may be nested, nested blocks join the outermost transaction
+        which commits once on exit or rolls back on error.
+        """
+        if self.transaction_depth:
+            self.transaction_depth += 1
+            try:
+                yield
+            finally:
+                self.transaction_depth -= 1
+            return
+
+        self.transaction_depth = 1
+        try:
+            with self.conn:
+                yield
+        finally:
+            self.transaction_depth = 0
+
     def execute(
         self,
         sql: str,
@@ -160,7 +215,7 @@ class Db:
     ) -> int:
         if not params:
             params = {}
-        with self.conn:
+        with self.transaction():
             cursor = self.conn.execute(sql, params)
             rowcount = cursor.rowcount
         return rowcount
@@ -174,10 +229,9 @@ class Db:
         if not params:
             params = {}
 
-        with self.conn:
-            cursor = self.conn.execute(sql, params)
-            cursor.row_factory = self.row_factory_wrapper(model_class)
-            instance = cursor.fetchone()
+        cursor = self.conn.execute(sql, params)
+        cursor.row_factory = self.row_factory_wrapper(model_class)
+        instance = cursor.fetchone()
 
         return instance
 
@@ -191,10 +245,12 @@ class Db:
         if not params:
             params = {}
 
-        with self.conn:
-            cursor = self.conn.execute(sql, params)
-            cursor.row_factory = self.row_factory_wrapper(model_class)
-            instances = cursor.fetchmany(size=size)
+        cursor = self.conn.execute(sql, params)
+        cursor.row_factory = self.row_factory_wrapper(model_class)
+        instances = cursor.fetchmany(size=size)
+
+        # Release the read snapshot held by the unfinished statement
+        cursor.close()
         return instances
 
     def execute_and_fetchall[T](
@@ -206,10 +262,9 @@ class Db:
         if not params:
             params = {}
 
-        with self.conn:
-            cursor = self.conn.execute(sql, params)
-            cursor.row_factory = self.row_factory_wrapper(model_class)
-            instances = cursor.fetchall()
+        cursor = self.conn.execute(sql, params)
+        cursor.row_factory = self.row_factory_wrapper(model_class)
+        instances = cursor.fetchall()
         return instances
 
 
@@ -220,33 +275,110 @@ Snapshot = t.NamedTuple(
         ("ref_sha", str),
         ("action", ProcessAction),
         ("state", ProcessState),
-        ("created_at", datetime.datetime),
+        ("created_at", str),
         ("created_by", str),
-        ("updated_at", datetime.datetime),
+        ("updated_at", str),
         ("updated_by", str),
         ("pid", int),
-        ("efd", datetime.datetime),
-        ("etd", datetime.datetime),
+        ("efd", str),
+        ("etd", str),
     ],
 )
 
 
+SNAPSHOT_GET_SQL = """
+SELECT *
+FROM snapshot
+WHERE ref_sha = :ref_sha
+"""
+
+SNAPSHOT_ADOPT_SQL = """
+UPDATE snapshot SET
+    action = :action,
+    state = :running_state,
+    updated_at = :updated_at,
+    updated_by = :updated_by,
+    pid = :pid
+WHERE ref_sha = :ref_sha
+    AND state = :state
+RETURNING *
+"""
+
+SNAPSHOT_COMPLETE_SQL = """
+UPDATE snapshot SET
+    state = :complete_state,
+    updated_at = :updated_at,
+    updated_by = :updated_by,
+    efd = :efd
+WHERE ref_sha = :ref_sha
+    AND state = :state
+RETURNING *
+"""
+
+SNAPSHOT_ABANDON_SQL = """
+UPDATE snapshot SET
+    state = :abandoned_state,
+    updated_at = :updated_at,
+    updated_by = :updated_by,
+    efd = :efd
+WHERE ref_sha = :ref_sha
+    AND state = :state
+RETURNING *
+"""
+
+SNAPSHOT_SCHEDULE_FOR_RELEASE_SQL = """
+UPDATE snapshot SET
+    action = :release_action,
+    state = :scheduled_state,
+    updated_at = :updated_at,
+    updated_by = :updated_by,
+    efd = :efd
+WHERE ref_sha = :ref_sha
+    AND state = :state
+RETURNING *
+"""
+
+SNAPSHOT_CREATE_SQL = """
+INSERT INTO snapshot (
+    ref,
+    ref_sha,
+    action,
+    state,
+    created_at,
+    created_by,
+    pid,
+    efd
+)
+SELECT
+    :ref,
+    :ref_sha,
+    :action,
+    :state,
+    :created_at,
+    :created_by,
+    :pid,
+    :efd
+WHERE NOT EXISTS (
+    SELECT *
+    FROM snapshot
+    WHERE ref_sha = :ref_sha
+)
+RETURNING *
+"""
+
+
 class SnapshotManager:
     def __init__(self, db: Db) -> None:
         self.db = db
 
     def list(self, size: int) -> list[Snapshot]:
         return self.db.execute_and_fetchmany(
-            sql="SELECT rowid, * FROM release", size=size, model_class=Snapshot
+            sql="SELECT * FROM snapshot", size=size, model_class=Snapshot
         )
 
     def get(self, ref_sha: str) -> Snapshot | None:
         """Get a snapshot for the ref_sha."""
-        sql = """
-        SELECT *
-        FROM snapshot
-        WHERE ref_sha = :ref_sha
-        """
+        sql = SNAPSHOT_GET_SQL
         params = {"ref_sha": ref_sha}
         return self.db.execute_and_fetchone(
             sql=sql, model_class=Snapshot, params=params
@@ -262,17 +394,7 @@ class SnapshotManager:
     ) -> Snapshot | None:
         """Attempt to adopt a commit optimistically."""
 
-        sql = """
-        UPDATE snapshot SET
-            action = :action,
-            state = :running_state,
-            updated_at = :updated_at,
-            updated_by = :updated_by,
-            pid = :pid
-        WHERE ref_sha = :ref_sha
-            AND state = :state
-        RETURNING *
-        """
+        sql = SNAPSHOT_ADOPT_SQL
 
         ref_sha = snapshot.ref_sha
         state = snapshot.state
@@ -286,9 +408,10 @@ class SnapshotManager:
             "updated_by": user,
             "pid": pid,
         }
-        return self.db.execute_and_fetchone(
-            sql=sql, model_class=Snapshot, params=params
-        )
+        with self.db.transaction():
+            return self.db.execute_and_fetchone(
+                sql=sql, model_class=Snapshot, params=params
+            )
 
     def complete(
         self,
@@ -298,16 +421,7 @@ class SnapshotManager:
     ) -> Snapshot | None:
         """Mark the snapshot as completed."""
 
-        sql = """
-        UPDATE snapshot SET
-            state = :complete_state,
-            updated_at = :updated_at,
-            updated_by = :updated_by,
-            efd = :efd
-        WHERE ref_sha = :ref_sha
-            AND state = :state
-        RETURNING *
-        """
+        sql = SNAPSHOT_COMPLETE_SQL
 
         ref_sha = snapshot.ref_sha
         state = snapshot.state
@@ -320,9 +434,10 @@ class SnapshotManager:
             "updated_by": user,
             "efd": current_datetime,
         }
-        return self.db.execute_and_fetchone(
-            sql=sql, model_class=Snapshot, params=params
-        )
+        with self.db.transaction():
+            return self.db.execute_and_fetchone(
+                sql=sql, model_class=Snapshot, params=params
+            )
 
     def abandon(
         self,
@@ -332,16 +447,7 @@ class SnapshotManager:
     ) -> Snapshot | None:
         """Mark the snapshot as abandoned."""
 
-        sql = """
-        UPDATE snapshot SET
-            state = :abandoned_state,
-            updated_at = :updated_at,
-            updated_by = :updated_by,
-            efd = :efd
-        WHERE ref_sha = :ref_sha
-            AND state = :state
-        RETURNING *
-        """
+        sql = SNAPSHOT_ABANDON_SQL
 
         ref_sha = snapshot.ref_sha
         state = snapshot.state
@@ -354,9 +460,10 @@ class SnapshotManager:
             "updated_by": user,
             "efd": current_datetime,
         }
-        return self.db.execute_and_fetchone(
-            sql=sql, model_class=Snapshot, params=params
-        )
+        with self.db.transaction():
+            return self.db.execute_and_fetchone(
+                sql=sql, model_class=Snapshot, params=params
+            )
 
     def schedule_for_release(
         self,
@@ -366,17 +473,7 @@ class SnapshotManager:
     ) -> Snapshot | None:
         """Schedule the snapshot for release."""
 
-        sql = """
-        UPDATE snapshot SET
-            action = :release_action,
-            state = :scheduled_state,
-            updated_at = :updated_at,
-            updated_by = :updated_by,
-            efd = :efd
-        WHERE ref_sha = :ref_sha
-            AND state = :state
-        RETURNING *
-        """
+        sql = SNAPSHOT_SCHEDULE_FOR_RELEASE_SQL
 
         ref_sha = snapshot.ref_sha
         state = snapshot.state
@@ -390,9 +487,10 @@ class SnapshotManager:
             "updated_by": user,
             "efd": current_datetime,
         }
-        return self.db.execute_and_fetchone(
-            sql=sql, model_class=Snapshot, params=params
-        )
+        with self.db.transaction():
+            return self.db.execute_and_fetchone(
+                sql=sql, model_class=Snapshot, params=params
+            )
 
     def create(
         self,
@@ -405,33 +503,7 @@ class SnapshotManager:
         pid: int,
     ) -> Snapshot:
         """Optimistically try and create a snapshot."""
-        sql = """
-        INSERT INTO snapshot (
-            ref,
-            ref_sha,
-            action,
-            state,
-            created_at,
-            created_by,
-            pid,
-            efd
-        )
-        SELECT
-            :ref,
-            :ref_sha,
-            :action,
-            :state,
-            :created_at,
-            :created_by,
-            :pid,
-            :efd
-        WHERE NOT EXISTS (
-            SELECT *
-            FROM snapshot
-            WHERE ref_sha = :ref_sha
-        )
-        RETURNING *
-        """
+        sql = SNAPSHOT_CREATE_SQL
         params = {
             "ref": ref,
             "ref_sha": ref_sha,
@@ -442,41 +514,60 @@ class SnapshotManager:
             "pid": pid,
             "efd": current_datetime,
         }
-        return self.db.execute_and_fetchone(
-            sql=sql, model_class=Snapshot, params=params
-        )
+        with self.db.transaction():
+            return self.db.execute_and_fetchone(
+                sql=sql, model_class=Snapshot, params=params
+            )
 
 
 CacheObject = t.NamedTuple(
-    "Object",
-    fields=[
+    "CacheObject",
+    [
         ("key", str),
         ("value", str),
     ],
 )
 
 
+CACHE_GET_SQL = "SELECT * FROM cache WHERE key = :key"
+
+CACHE_SET_SQL = """
+INSERT INTO cache
+VALUES (:key, :value)
+ON CONFLICT (key) DO UPDATE SET value = excluded.value
+RETURNING *
+"""
+
+CACHE_DELETE_PREFIX_SQL = """
+DELETE FROM cache
+WHERE substr(key, 1, length(:prefix)) = :prefix
+"""
+
+
 class Cache:
     def __init__(self, db: Db) -> None:
         self.db = db
 
     def get(self, key: str) -> CacheObject | None:
-        sql = "SELECT * FROM cache WHERE key = :key"
+        sql = CACHE_GET_SQL
         params = {"key": key}
         return self.db.execute_and_fetchone(
             sql=sql, model_class=CacheObject, params=params
         )
 
     def set(self, key: str, value: str) -> CacheObject:
-        sql = """
-        INSERT INTO cache
-        VALUES (:key, :value)
-        RETURNING *
-        """
+        sql = CACHE_SET_SQL
         params = {"key": key, "value": value}
-        return self.db.execute_and_fetchone(
-            sql=sql, model_class=CacheObject, params=params
-        )
+        with self.db.transaction():
+            return self.db.execute_and_fetchone(
+                sql=sql, model_class=CacheObject, params=params
+            )
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every cache object with a key starting with the prefix."""
+        sql = CACHE_DELETE_PREFIX_SQL
+        params = {"prefix": prefix}
+        return self.db.execute(sql=sql, params=params)
 
 
 def remove_stale_builds(
@@ -484,57 +575,175 @@ def remove_stale_builds(
     exclude_paths: list[pathlib.Path],
     keep_builds: int,
     log_title: str = "",
+    repo_path: pathlib.Path | None = None,
 ) -> None:
-    """Remove stale builds."""
-    existing_builds_path = [
-        path for path in builds_path.glob("*") if path not in exclude_paths
-    ]
-    existing_builds_path_sorted = sort_paths_by_last_status_change(
-        existing_builds_path, reverse=True
-    )
+    """Remove stale builds.
+
+    If the builds are git worktrees provide the repo path so that their
+    administrative files are pruned from the repository.
+    """
+    exclude_paths_str = {str(path) for path in exclude_paths}
+
+    with os.scandir(builds_path) as entries:
+        existing_builds = [
+            (entry.stat().st_ctime, entry.path)
+            for entry in entries
+            if entry.path not in exclude_paths_str
+        ]
+
+    existing_builds.sort(reverse=True)
+    stale_builds_path = [path for _, path in existing_builds[keep_builds:]]
+
+    # Removal is syscall bound, so remove the independent trees concurrently. The
+    # common case of a single stale build skips the pool.
+    if len(stale_builds_path) > 1:
+        max_workers = min(os.cpu_count() or 1, 8, len(stale_builds_path))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(shutil.rmtree, stale_builds_path))
+    else:
+        for path in stale_builds_path:
+            shutil.rmtree(path)
 
-    log_body = ""
-    for path in existing_builds_path_sorted[keep_builds:]:
-        shutil.rmtree(path)
-        log_body += f"+ {path}"
+    log_body = "\n".join(f"+ {path}" for path in stale_builds_path)
 
     if log_body:
         clean_and_log(title=log_title, body=log_body)
 
+        if repo_path:
+            git_worktree_prune(repo_path=repo_path, environ=os.environ)
 
-def download_file(url: str, path: pathlib.Path) -> str:
-    """Download the provided resource and calculate it's md5 hash."""
-    hasher = hashlib.md5()
-    resp = urllib.request.urlopen(url)
 
-    with path.open("wb") as stream:
-        while True:
-            chunk = resp.read(1024)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
 
-            if not chunk:
-                break
 
+def download_file(url: str, path: pathlib.Path) -> str:
+    """Download the provided resource and calculate it's sha256 digest."""
+    import urllib.request
+
+    hasher = hashlib.sha256()
+
+    with urllib.request.urlopen(url) as resp, path.open("wb") as stream:
+        while chunk := resp.read(DOWNLOAD_CHUNK_SIZE):
             stream.write(chunk)
             hasher.update(chunk)
 
     return hasher.hexdigest()
 
 
-def download_tailwindcss_standalone(version: str, path: pathlib.Path) -> str:
-    """Download the provided resource and calculate it's md5 hash."""
-    url = f"https://github.com/tailwindlabs/tailwindcss/releases/download/{version}/tailwindcss-linux-x64"
-    md5 = download_file(url, path)
-    chmod_executable(path=path)
-    return md5
+def download_tailwindcss_standalone(
+    version: str,
+    path: pathlib.Path,
+    platform: str = "linux-x64",
+    sha256: str | None = None,
+) -> str:
+    """Download the provided resource and calculate it's sha256 digest.
+
+    The binary is downloaded to a temporary file which is moved into place once
+    complete, so concurrent builds never observe a partial download. The
+    download is verified against the sha256 published with the release when
+    one is provided, otherwise a warning is logged as it is not verified.
+    """
+    if sha256 is None:
+        logger.warning(
+            f"No sha256 pinned for tailwindcss {version} {platform}, "
+            "the download will not be verified"
+        )
+
+    url = f"https://github.com/tailwindlabs/tailwindcss/releases/download/{version}/tailwindcss-{platform}"
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    try:
+        digest = download_file(url, tmp_path)
+
+        if sha256 is not None and digest != sha256:
+            raise DependencyError(
+                f"Checksum mismatch for tailwindcss {version} {platform}, "
+                f"expected {sha256} got {digest}."
+            )
+
+        chmod_executable(path=tmp_path)
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    return digest
+
+
+def get_files_digest(
+    paths: list[pathlib.Path], prefix: str = "", root: pathlib.Path | None = None
+) -> str:
+    """Calculate a blake2b digest over the content of the provided files.
+
+    If a root is provided the path of each file relative to it is included, so
+    that renaming or moving a file also changes the digest.
+    """
+    hasher = hashlib.blake2b(prefix.encode())
+
+    for path in sorted(paths):
+        content = path.read_bytes()
+
+        if root:
+            hasher.update(f"{path.relative_to(root)}\0".encode())
+
+        hasher.update(f"{len(content)}\0".encode())
+        hasher.update(content)
+
+    return hasher.hexdigest()
+
+
+def remove_expired_files(path: pathlib.Path, max_age: float, suffix: str = "") -> None:
+    """Remove files directly within the path not modified for max_age seconds."""
+    expires_at = time.time() - max_age
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.name.endswith(suffix) or not entry.is_file():
+                continue
+
+            if entry.stat().st_mtime < expires_at:
+                pathlib.Path(entry.path).unlink(missing_ok=True)
+
+
+def hardlink_or_copy(source: pathlib.Path, target: pathlib.Path) -> None:
+    """Hardlink the source to the target, copying it across file systems.
+
+    The link or copy is made to a temporary sibling which then replaces the target
+    atomically, so readers never see a missing or partially written target.
+    """
+
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    try:
+        try:
+            tmp_path.hardlink_to(source)
+        except OSError:
+            shutil.copy2(source, tmp_path)
+
+        tmp_path.replace(target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def create_or_update_symlink(
     path: pathlib.Path, target: pathlib.Path, target_is_directory: bool
 ) -> None:
-    """Create or update an existing symlink."""
+    """Create or update an existing symlink.
 
-    path.unlink(missing_ok=True)
-    path.symlink_to(target=target, target_is_directory=target_is_directory)
+    The symlink is created next to the path and renamed over it so the path
+    always resolves, nothing is done when it already points to the target.
+    """
+
+    try:
+        if os.readlink(path) == str(target):
+            return
+    except OSError:
+        pass
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    tmp_path.symlink_to(target=target, target_is_directory=target_is_directory)
+    tmp_path.replace(path)
 
     clean_and_log(title="Symlink created", body=f"+ {path} -> {target}")
 
@@ -550,19 +759,21 @@ def chmod_executable(path: pathlib.Path) -> None:
 def acquire_advisory_lock(
     lock_path: pathlib.Path, non_blocking: bool = False
 ) -> t.Generator[bool, None, None]:
-    """Acquire an advisory lock."""
+    """Acquire an advisory lock.
+
+    The lock file is opened without truncating it so any content is preserved.
+    """
 
     if non_blocking:
         flags = fcntl.LOCK_EX | fcntl.LOCK_NB
     else:
         flags = fcntl.LOCK_EX
 
-    f = lock_path.open("w")
-    fd = f.fileno()
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
 
     try:
         logger.debug("Acquiring advisory lock")
-        fcntl.lockf(fd, flags)
+        fcntl.flock(fd, flags)
         logger.debug("Advisory lock acquired")
 
         yield True
@@ -570,8 +781,8 @@ def acquire_advisory_lock(
         yield False
     finally:
         logger.debug("Releasing advisory lock")
-        fcntl.lockf(fd, fcntl.LOCK_UN)
-        f.close()
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
         logger.debug("Advisory lock released")
 
 
@@ -614,17 +825,48 @@ def clean_and_log(title: str, body: str, level: str = "INFO") -> None:
         logger.info(content_clean)
 
 
+def format_box_table(names: list[str], rows: list[tuple[t.Any, ...]]) -> str:
+    """Format rows as a box drawn table, similar to the sqlite3 box mode."""
+
+    if not rows:
+        return ""
+
+    values = [["" if value is None else f"{value}" for value in row] for row in rows]
+    widths = [
+        max([len(name), *(len(row[index]) for row in values)])
+        for index, name in enumerate(names)
+    ]
+
+    def line(left: str, middle: str, right: str) -> str:
+        return left + middle.join("─" * (width + 2) for width in widths) + right
+
+    def cells(items: list[str], align: str) -> str:
+        return (
+            "│"
+            + "│".join(f" {item:{align}{width}} " for item, width in zip(items, widths))
+            + "│"
+        )
+
+    table = [
+        line("┌", "┬", "┐"),
+        cells(names, "^"),
+        line("├", "┼", "┤"),
+        *(cells(row, "<") for row in values),
+        line("└", "┴", "┘"),
+    ]
+    return "\n".join(table) + "\n"
+
+
 @contextlib.contextmanager
 def time_and_log(message_prefix: str) -> t.Generator[None, None, None]:
     """Provides a context manager for timing.
 
     The process time in milliseconds is automatically logged.
     """
-    start_time = time.monotonic()
+    start_time = time.perf_counter_ns()
     yield
-    total_seconds = time.monotonic() - start_time
-    total_milliseconds = total_seconds * 1000
-    logger.info(f"{message_prefix}{total_milliseconds:.0f}ms")
+    total_milliseconds = (time.perf_counter_ns() - start_time) // 1_000_000
+    logger.info(f"{message_prefix}{total_milliseconds}ms")
 
 
 def load_module_from_path(path: pathlib.Path) -> ModuleType:
@@ -658,12 +900,7 @@ def get_resolved_path_absolute(path: pathlib.Path | str) -> pathlib.Path:
     return path.expanduser().resolve().absolute()
 
 
-def create_or_replace_symlink(
-    path: pathlib.Path, target: pathlib.Path, target_is_directory: bool
-) -> None:
-    """Create a symlink or replace it if it already exists."""
-    path.unlink(missing_ok=True)
-    path.symlink_to(target, target_is_directory=target_is_directory)
+create_or_replace_symlink = create_or_update_symlink
 
 
 def sort_paths_by_last_status_change(
@@ -673,30 +910,20 @@ def sort_paths_by_last_status_change(
     return sorted(paths, key=lambda p: p.stat().st_ctime, reverse=reverse)
 
 
-def parse_dotenv(content: str) -> dict[str, str]:
-    """Extract env variables from a dotenv file."""
-
-    environ = {}
-
-    for line_raw in content.splitlines():
-        line = line_raw.strip()
-
-        if not line:
-            continue
-
-        if line.startswith("#"):
-            continue
+DOTENV_PATTERN = re.compile(
+    r'^[ \t]*+(?!#)(?:export )?([^=\n]*)=(?:"(.*)"|(.*?))[ \t\r]*$', re.MULTILINE
+)
 
-        expression = line.removeprefix("export ")
-        name, value = expression.split("=", maxsplit=1)
 
-        if value.startswith('"') and value.endswith('"'):
-            value = value.removeprefix('"')
-            value = value.removesuffix('"')
+def parse_dotenv(content: str) -> dict[str, str]:
+    """Extract env variables from a dotenv file.
 
-        environ[name] = value
+    Blank lines, comments and lines without an assignment are skipped.
+    """
 
-    return environ
+    return {
+        name: quoted or value for name, quoted, value in DOTENV_PATTERN.findall(content)
+    }
 
 
 def get_environ_from_dotenv(path: pathlib.Path) -> dict[str, str]:
@@ -707,17 +934,34 @@ def get_environ_from_dotenv(path: pathlib.Path) -> dict[str, str]:
 
 
 def render_template_and_save(
-    path: pathlib.Path, template_name: str, jinja_env: Environment, **kwargs: t.Any
+    path: pathlib.Path,
+    template_name: str,
+    jinja_env: Environment,
+    template: Template | None = None,
+    **kwargs: t.Any,
 ) -> str:
-    env_template = jinja_env.get_template(template_name)
-    env_content = env_template.render(**kwargs)
-    path.write_text(env_content)
-    hasher = hashlib.md5(env_content.encode())
-    md5 = hasher.hexdigest()
+    """Render a template and save it to the path.
+
+    A pre-compiled template may be provided to skip the environment lookup.
+
+    The file is only rewritten when its content changes so that its mtime is
+    left alone otherwise.
+    """
+    if not template:
+        template = jinja_env.get_template(template_name)
+
+    content = template.render(**kwargs).encode()
+    digest = hashlib.sha256(content).hexdigest()
+
+    if not path.exists() or path.read_bytes() != content:
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(content)
+        tmp_path.replace(path)
+
     clean_and_log(
-        title=f"Rendering template '{template_name}'", body=f"+ checksum={md5}"
+        title=f"Rendering template '{template_name}'", body=f"+ checksum={digest}"
     )
-    return md5
+    return digest
 
 
 def which_or_raise(executable: str) -> pathlib.Path:
@@ -734,10 +978,11 @@ def which_or_raise(executable: str) -> pathlib.Path:
     return pathlib.Path(path_raw)
 
 
+@functools.cache
 def get_uv_path_or_raise(username: str) -> pathlib.Path:
     """Get the path to the uv executable for the given user.
 
-    If it does not exist raise an error.
+    If it does not exist raise an error, the path is memoized once found.
     """
 
     path = pathlib.Path(f"/home/{username}/.local/bin/uv")
@@ -751,6 +996,16 @@ def get_uv_path_or_raise(username: str) -> pathlib.Path:
 GIT_PATH = which_or_raise("git")
 
 
+def get_user_cache_path() -> pathlib.Path:
+    """Return the bou cache directory of the current user.
+
+    Follows the XDG base directory specification, defaulting to ~/.cache/bou.
+    """
+
+    cache_home_path = pathlib.Path(os.environ.get("XDG_CACHE_HOME") or "~/.cache")
+    return cache_home_path.expanduser() / "bou"
+
+
 def get_python_path_from_venv(venv_path: pathlib.Path) -> pathlib.Path:
     """Return the path to the python binary within a virtual env."""
 
@@ -758,21 +1013,31 @@ def get_python_path_from_venv(venv_path: pathlib.Path) -> pathlib.Path:
 
 
 class SubProcess:
-    """Utility for running sub processes."""
+    """Utility for running sub processes.
+
+    Commands are run without a shell or preexec hook and with an absolute
+    executable path, which lets CPython spawn children with posix_spawn/vfork
+    instead of forking the whole interpreter. An environ of None inherits the
+    environment of the current process without copying it.
+    """
 
     def __init__(
         self,
         description: str,
         command: list[str],
-        environ: dict[str, str],
+        environ: t.Mapping[str, str] | None,
         cwd: pathlib.Path | None,
         error_prefix: str = "",
+        stdin: str | None = None,
+        log_stdout: bool = True,
     ) -> None:
         self.description = description
         self.command = command
         self.environ = environ
         self.cwd = cwd
         self.error_prefix = error_prefix
+        self.stdin = stdin
+        self.log_stdout = log_stdout
 
     def run(self) -> str:
         """Run the subprocess and log any exceptions."""
@@ -782,29 +1047,49 @@ class SubProcess:
         environ = self.environ
         result = None
 
+        # Resolve the executable the same way the child would, if it can not be
+        # found leave it to subprocess to raise
+        path = (os.environ if environ is None else environ).get("PATH", os.defpath)
+        executable = shutil.which(command[0], path=path)
+
+        if executable:
+            command = [executable, *command[1:]]
+
+        stdin = self.stdin.encode() if self.stdin is not None else None
+
+        # Output is captured as bytes and decoded once, rather than decoded
+        # incrementally as the pipes are read
         try:
             result = subprocess.run(
                 command,
                 check=True,
                 capture_output=True,
-                text=True,
                 env=environ,
                 cwd=cwd,
+                input=stdin,
+                close_fds=True,
             )
+            stdout = result.stdout.decode(errors="replace")
+            stderr = result.stderr.decode(errors="replace")
 
             # stderr is generally used logging info, but not always
-            if result.stderr:
-                output = result.stderr
+            if stderr:
+                output = stderr
+            elif self.log_stdout:
+                output = stdout
             else:
-                output = result.stdout
+                output = ""
 
             title = self.description
             clean_and_log(title=title, body=output)
 
-            return result.stdout
+            return stdout
         except subprocess.SubprocessError as ex:
             error = getattr(ex, "stderr", "")
 
+            if isinstance(error, bytes):
+                error = error.decode(errors="replace")
+
             if not error:
                 error = f"{ex}"
 
@@ -818,8 +1103,8 @@ def age_decrypt(
 ) -> str:
     """Decrypt a file with age."""
     cwd = None
-    environ = {**os.environ}
-    command = f"{age_path} -d -i {identity_path} {target_path}"
+    environ = None
+    command = [f"{age_path}", "-d", "-i", f"{identity_path}", f"{target_path}"]
 
     process = SubProcess(
         description=f"Descrypting {target_path}",
@@ -837,7 +1122,7 @@ def sudo_cp(
 ) -> None:
     """Restart the provided systemd service."""
     cwd = None
-    environ = {**os.environ}
+    environ = None
 
     with tempfile.NamedTemporaryFile("wb") as f:
         f.write(content)
@@ -846,8 +1131,7 @@ def sudo_cp(
         source_path = pathlib.Path(f.name)
         source_path
 
-        command_raw = f"sudo cp {source_path} {target_path}"
-        command = shlex.split(command_raw)
+        command = ["sudo", "cp", f"{source_path}", f"{target_path}"]
 
         process = SubProcess(
             description=f"Copying content to {target_path}",
@@ -866,14 +1150,12 @@ def systemctl_restart(
 ) -> None:
     """Restart the provided systemd service."""
     cwd = None
-    environ = {**os.environ}
+    environ = None
 
-    command_raw = f"systemctl {flags} restart {service}"
+    command = ["systemctl", *flags.split(), "restart", service]
 
     if sudo:
-        command_raw = f"sudo {command_raw}"
-
-    command = shlex.split(command_raw)
+        command = ["sudo", *command]
 
     process = SubProcess(
         description="Restart systemd service",
@@ -891,14 +1173,12 @@ def systemctl_daemon_reload(
 ) -> None:
     """Restart the provided systemd service."""
     cwd = None
-    environ = {**os.environ}
+    environ = None
 
-    command_raw = f"systemctl {flags} daemon-reload"
+    command = ["systemctl", *flags.split(), "daemon-reload"]
 
     if sudo:
-        command_raw = f"sudo {command_raw}"
-
-    command = shlex.split(command_raw)
+        command = ["sudo", *command]
 
     process = SubProcess(
         description="Reload systemd units",
@@ -917,14 +1197,12 @@ def systemctl_enable(
 ) -> None:
     """Enable the provided systemd service."""
     cwd = None
-    environ = {**os.environ}
+    environ = None
 
-    command_raw = f"systemctl enable {flags} {service}"
+    command = ["systemctl", "enable", *flags.split(), service]
 
     if sudo:
-        command_raw = f"sudo {command_raw}"
-
-    command = shlex.split(command_raw)
+        command = ["sudo", *command]
 
     process = SubProcess(
         description="Enable systemd service",
@@ -939,11 +1217,11 @@ def systemctl_enable(
 def git_reset_hard(
     ref_sha: str,
     build_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
     git_path: pathlib.Path = GIT_PATH,
 ) -> None:
     """Helper for running git reset."""
-    command = shlex.split(f"{git_path} -C {build_path} reset --hard {ref_sha}")
+    command = [f"{git_path}", "-C", f"{build_path}", "reset", "--hard", ref_sha]
     process = SubProcess(
         description="Running git reset",
         command=command,
@@ -956,11 +1234,11 @@ def git_reset_hard(
 
 def git_fetch(
     build_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
     git_path: pathlib.Path = GIT_PATH,
 ) -> None:
     """Helper for running git fetch."""
-    command = shlex.split(f"{git_path} -C {build_path} fetch")
+    command = [f"{git_path}", "-C", f"{build_path}", "fetch"]
     process = SubProcess(
         description="Running git fetch",
         command=command,
@@ -974,11 +1252,18 @@ def git_fetch(
 def git_clone(
     repo_path: pathlib.Path,
     build_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
     git_path: pathlib.Path = GIT_PATH,
 ) -> None:
     """Helper for running git clone."""
-    command = shlex.split(f"{git_path} -C {repo_path} clone {repo_path} {build_path}")
+    command = [
+        f"{git_path}",
+        "-C",
+        f"{repo_path}",
+        "clone",
+        f"{repo_path}",
+        f"{build_path}",
+    ]
     process = SubProcess(
         description="Running git clone",
         command=command,
@@ -989,33 +1274,90 @@ def git_clone(
     process.run()
 
 
+def git_worktree_add(
+    ref_sha: str,
+    repo_path: pathlib.Path,
+    build_path: pathlib.Path,
+    environ: t.Mapping[str, str],
+    git_path: pathlib.Path = GIT_PATH,
+) -> None:
+    """Helper for running git worktree add."""
+    command = [
+        f"{git_path}",
+        "-C",
+        f"{repo_path}",
+        "worktree",
+        "add",
+        "--detach",
+        "--force",
+        f"{build_path}",
+        ref_sha,
+    ]
+    process = SubProcess(
+        description="Running git worktree add",
+        command=command,
+        environ=environ,
+        cwd=None,
+        error_prefix="Failed to git run worktree add ",
+    )
+    process.run()
+
+
+def git_worktree_prune(
+    repo_path: pathlib.Path,
+    environ: t.Mapping[str, str],
+    git_path: pathlib.Path = GIT_PATH,
+) -> None:
+    """Helper for running git worktree prune."""
+    command = [f"{git_path}", "-C", f"{repo_path}", "worktree", "prune"]
+    process = SubProcess(
+        description="Running git worktree prune",
+        command=command,
+        environ=environ,
+        cwd=None,
+        error_prefix="Failed to git run worktree prune ",
+    )
+    process.run()
+
+
 def git_checkout_ref_sha(
     ref_sha: str,
     repo_path: pathlib.Path,
     build_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
     git_path: pathlib.Path = GIT_PATH,
 ) -> None:
     """This procedure runs the following process:
 
-    1. Clone the repository if it does not exist
-    2. Fetch and reset to the ref sha if the repository does exist
+    1. Add a detached worktree of the repository if it does not exist
+    2. Reset to the ref sha if the worktree does exist
+
+    Worktrees share the object store of the repository so nothing is fetched or
+    cloned. Builds previously checked out as clones are only fetched when the ref
+    sha is missing from the clone, after which the reset is retried.
     """
-    if build_path.exists():
-        git_fetch(
+    if not build_path.exists():
+        git_worktree_add(
+            ref_sha=ref_sha,
+            repo_path=repo_path,
             build_path=build_path,
             git_path=git_path,
             environ=environ,
         )
+        return
+
+    try:
         git_reset_hard(
             ref_sha=ref_sha,
             build_path=build_path,
             git_path=git_path,
             environ=environ,
         )
-    else:
-        git_clone(
-            repo_path=repo_path,
+    except BuildError:
+        if not (build_path / ".git").is_dir():
+            raise
+
+        git_fetch(
             build_path=build_path,
             git_path=git_path,
             environ=environ,
@@ -1033,15 +1375,20 @@ def create_venv_with_uv(
     venv_path: pathlib.Path,
     venv_prompt: str,
     uv_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
 ) -> None:
     """Create a virtual env using uv."""
-    environ |= {"VIRTUAL_ENV": f"{venv_path}", "UV_VENV_CLEAR": "1"}
+    environ = {**environ, "VIRTUAL_ENV": f"{venv_path}", "UV_VENV_CLEAR": "1"}
 
     cwd = build_path
-    command = shlex.split(
-        f"{uv_path} venv --no-project --prompt {venv_prompt} {venv_path}"
-    )
+    command = [
+        f"{uv_path}",
+        "venv",
+        "--no-project",
+        "--prompt",
+        venv_prompt,
+        f"{venv_path}",
+    ]
 
     process = SubProcess(
         description="Creating virtual env with uv",
@@ -1053,15 +1400,69 @@ def create_venv_with_uv(
     process.run()
 
 
+def get_ref_cache_key_prefix(repo_path: pathlib.Path, ref: str) -> str:
+    """Get the prefix shared by every cache key of a ref."""
+
+    return f"ref_sha:{repo_path}:{ref}:"
+
+
+def get_ref_cache_key(repo_path: pathlib.Path, ref: str) -> str:
+    """Get a cache key for a ref which changes whenever the ref could have moved.
+
+    The key is stamped with the inode, size and modification time of the files
+    git may resolve the ref from, including the reftable stack. git replaces
+    these files by renaming a new file over them, so a push which updates the
+    ref also invalidates the key even when it lands within the same timestamp
+    tick.
+    """
+    ref_file_paths = [
+        repo_path / "HEAD",
+        repo_path / "packed-refs",
+        repo_path / "reftable/tables.list",
+        repo_path / ref,
+        repo_path / "refs" / ref,
+        repo_path / "refs/tags" / ref,
+        repo_path / "refs/heads" / ref,
+        repo_path / "refs/remotes" / ref,
+    ]
+
+    stamps = []
+    for path in ref_file_paths:
+        try:
+            path_stat = path.stat()
+        except OSError:
+            stamps.append("0")
+        else:
+            stamps.append(
+                f"{path_stat.st_ino}-{path_stat.st_size}-{path_stat.st_mtime_ns}"
+            )
+
+    return f"{get_ref_cache_key_prefix(repo_path=repo_path, ref=ref)}{'.'.join(stamps)}"
+
+
 def get_ref_sha(
     repo_path: pathlib.Path,
     ref: str,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
     git_path: pathlib.Path = GIT_PATH,
+    cache: Cache | None = None,
 ) -> str:
-    """Get a git sha from a ref."""
+    """Get a git sha from a ref.
+
+    If a cache is provided the sha is reused until the ref is updated.
+    """
+    if cache:
+        cache_key = get_ref_cache_key(repo_path=repo_path, ref=ref)
+        cache_object = cache.get(cache_key)
+
+        # Stored JSON encoded as the numeric affinity of the cache value column
+        # would otherwise turn an all digit sha into an integer
+        if cache_object:
+            logger.debug(f"Using cached git sha for {ref}")
+            return json.loads(cache_object.value)
+
     cwd = None
-    command = shlex.split(f"{git_path} -C {repo_path} rev-parse --short {ref}")
+    command = [f"{git_path}", "-C", f"{repo_path}", "rev-parse", "--short", ref]
     process = SubProcess(
         description=f"Fetching git sha for {ref}",
         command=command,
@@ -1070,16 +1471,39 @@ def get_ref_sha(
         error_prefix="Failed to get ref sha for {ref!r} ",
     )
     result = process.run()
-    return result.strip()
+    ref_sha = result.strip()
+
+    # Keys of earlier ref updates can never match again, replace them
+    if cache:
+        with cache.db.transaction():
+            cache.delete_prefix(get_ref_cache_key_prefix(repo_path=repo_path, ref=ref))
+            cache.set(key=cache_key, value=json.dumps(ref_sha))
+
+    return ref_sha
+
+
+BARE_REPO_CACHE: dict[pathlib.Path, bool] = {}
 
 
 def get_is_bare_repo(
     repo_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
     git_path: pathlib.Path = GIT_PATH,
 ) -> bool:
-    """Return True if the repo is a bare repo."""
-    command = shlex.split(f"{git_path} -C {repo_path} rev-parse --is-bare-repository")
+    """Return True if the repo is a bare repo.
+
+    The result is memoized for the lifetime of the process.
+    """
+    if repo_path in BARE_REPO_CACHE:
+        return BARE_REPO_CACHE[repo_path]
+
+    command = [
+        f"{git_path}",
+        "-C",
+        f"{repo_path}",
+        "rev-parse",
+        "--is-bare-repository",
+    ]
     process = SubProcess(
         description="Checking if git repo is bare",
         command=command,
@@ -1088,19 +1512,21 @@ def get_is_bare_repo(
         error_prefix="Failed to check if repository is a bare repository ",
     )
     result = process.run()
-    return result.strip() == "true"
+    is_bare_repo = result.strip() == "true"
+    BARE_REPO_CACHE[repo_path] = is_bare_repo
+    return is_bare_repo
 
 
 def sync_deps_with_uv(
     build_path: pathlib.Path,
     venv_path: pathlib.Path,
     uv_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
 ) -> None:
     """Sync dependencies with uv."""
     cwd = build_path
-    environ |= {"VIRTUAL_ENV": f"{venv_path}", "UV_VENV_CLEAR": "1"}
-    command = shlex.split(f"{uv_path} sync")
+    environ = {**environ, "VIRTUAL_ENV": f"{venv_path}", "UV_VENV_CLEAR": "1"}
+    command = [f"{uv_path}", "sync"]
 
     process = SubProcess(
         description="Syncing dependencies with uv",
@@ -1117,14 +1543,19 @@ def pip_install_with_uv(
     venv_path: pathlib.Path,
     requirements_list: list[str],
     uv_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
 ) -> None:
-    """Pip install dependencies with uv."""
+    """Pip install dependencies with uv.
+
+    All requirements are passed to a single uv invocation so that they are
+    resolved and downloaded together.
+    """
     cwd = build_path
-    environ |= {"VIRTUAL_ENV": f"{venv_path}", "UV_VENV_CLEAR": "1"}
+    environ = {**environ, "VIRTUAL_ENV": f"{venv_path}", "UV_VENV_CLEAR": "1"}
 
-    requirements = " ".join(requirements_list)
-    command = shlex.split(f"{uv_path} pip install {requirements}")
+    # Entries may hold an option and its value, e.g. "-r requirements.txt"
+    requirements = [arg for entry in requirements_list for arg in entry.split()]
+    command = [f"{uv_path}", "pip", "install", *requirements]
 
     process = SubProcess(
         description="Pip installing dependencies with uv",
@@ -1141,13 +1572,16 @@ def tailwindcss_build_and_minify(
     input_file: pathlib.Path,
     output_file: pathlib.Path,
     tailwindcss_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
 ) -> None:
     """Run the tailwindcss build and minify command."""
     cwd = build_path
-    command = shlex.split(
-        f"{tailwindcss_path} --input={input_file} --output={output_file} --minify"
-    )
+    command = [
+        f"{tailwindcss_path}",
+        f"--input={input_file}",
+        f"--output={output_file}",
+        "--minify",
+    ]
     process = SubProcess(
         description="Compiling and minifying tailwind css",
         command=command,
@@ -1162,14 +1596,14 @@ def django_migrate(
     build_path: pathlib.Path,
     manage_path: pathlib.Path,
     venv_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
 ) -> None:
     """Run the django migrate command."""
     cwd = build_path
-    environ |= {"VIRTUAL_ENV": f"{venv_path}"}
+    environ = {**environ, "VIRTUAL_ENV": f"{venv_path}"}
     python_path = get_python_path_from_venv(venv_path)
 
-    command = shlex.split(f"{python_path} {manage_path} migrate")
+    command = [f"{python_path}", f"{manage_path}", "migrate"]
     process = SubProcess(
         description="Running django migrations",
         command=command,
@@ -1184,14 +1618,22 @@ def django_collectstatic(
     build_path: pathlib.Path,
     manage_path: pathlib.Path,
     venv_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
+    ignore_patterns: list[str] | None = None,
 ) -> None:
-    """Run the django check command."""
+    """Run the django collectstatic command.
+
+    Files and directories matching any of the ignore patterns are not collected.
+    """
     cwd = build_path
-    environ |= {"VIRTUAL_ENV": f"{venv_path}"}
+    environ = {**environ, "VIRTUAL_ENV": f"{venv_path}"}
     python_path = get_python_path_from_venv(venv_path)
 
-    command = shlex.split(f"{python_path} {manage_path} collectstatic --no-input")
+    if not ignore_patterns:
+        ignore_patterns = []
+
+    command = [f"{python_path}", f"{manage_path}", "collectstatic", "--no-input"]
+    command += [f"--ignore={pattern}" for pattern in ignore_patterns]
     process = SubProcess(
         description="Running django collectstatic",
         command=command,
@@ -1206,14 +1648,14 @@ def django_check(
     build_path: pathlib.Path,
     manage_path: pathlib.Path,
     venv_path: pathlib.Path,
-    environ: dict[str, str],
+    environ: t.Mapping[str, str],
 ) -> None:
     """Run the django check command."""
     cwd = build_path
-    environ |= {"VIRTUAL_ENV": f"{venv_path}"}
+    environ = {**environ, "VIRTUAL_ENV": f"{venv_path}"}
     python_path = get_python_path_from_venv(venv_path)
 
-    command = shlex.split(f"{python_path} {manage_path} check")
+    command = [f"{python_path}", f"{manage_path}", "check"]
     process = SubProcess(
         description="Running django check",
         command=command,
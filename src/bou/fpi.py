@@ -1,15 +1,20 @@
 """Foreign plugin interface."""
 
-import collections
+from __future__ import annotations
+
 import logging
+import os
 import pathlib
 import typing as t
 
-from jinja2 import Environment
 import pluggy
 
 from bou.errors import ConfigError
-from bou.contrib import Cache
+
+if t.TYPE_CHECKING:
+    from jinja2 import Environment
+
+    from bou.contrib import Cache
 
 logger = logging.getLogger("bou")
 
@@ -19,19 +24,48 @@ hookspec_v1 = pluggy.HookspecMarker("bou")
 hookimpl_v1 = pluggy.HookimplMarker("bou")
 
 
-class Config(collections.UserDict):
+class Config(dict[str, t.Any]):
     """Models the system config."""
 
+    __slots__ = ()
+
     def __init__(
         self,
-        build_path: pathlib.Path,
+        build_path: str | os.PathLike[str],
         **kwargs: t.Any,
     ) -> None:
         super().__init__(**kwargs)
-        self.data["build_path"] = build_path
+        self["build_path"] = build_path
+
+
+def validate_config(config: Config | None) -> Config:
+    """Validate the config returned by the configure hook.
+
+    A build_path given as a str or other path-like is converted to a
+    pathlib.Path once, so the build system does not have to.
+    """
+
+    if config is None:
+        raise ConfigError("configure did not return a config")
+
+    if "build_path" not in config:
+        raise ConfigError("build_path is a required key")
+
+    build_path = config["build_path"]
+
+    if isinstance(build_path, pathlib.Path):
+        return config
+
+    if not isinstance(build_path, (str, os.PathLike)):
+        raise ConfigError("build_path should be a path or str")
+
+    config["build_path"] = pathlib.Path(build_path)
+    return config
 
 
 class BuildSpec:
+    __slots__ = ()
+
     @hookspec_v1(firstresult=True)
     def configure(
         self,
@@ -129,7 +163,9 @@ class BuildPlugin:
     should expose the methods on this class at a module level.
     """
 
-    @hookimpl_v1(wrapper=True)
+    __slots__ = ()
+
+    @hookimpl_v1(trylast=True)
     def configure(
         self,
         ref: str,
@@ -138,20 +174,10 @@ class BuildPlugin:
         repo_path: pathlib.Path,
         jinja_env: Environment,
         cache: Cache,
-    ) -> t.Generator[None, Config, Config]:
+    ) -> Config | None:
         """Get the config from the build system."""
-        config: Config = yield
-
-        # Validation
-        if "build_path" not in config:
-            raise ConfigError("build_path is a required key")
-
-        build_path = config["build_path"]
-
-        if not isinstance(build_path, pathlib.Path):
-            raise ConfigError("build_path should be of type pathlib.Path")
-
-        return config
+        logger.debug("(base hook configure)")
+        return None
 
     @hookimpl_v1(tryfirst=True)
     def pre_build(